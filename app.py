@@ -1,11 +1,27 @@
+import io
 import os
+import queue
 import tempfile
+import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from hashlib import blake2b
 from flask import Flask, request, jsonify, send_file
+from flask.json.provider import JSONProvider
+import orjson
 import requests
-from typing import Dict, Any
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.parser import ParseFailedException
+from streaming_form_data.targets import BaseTarget
+from typing import BinaryIO, Dict, Any
 from dotenv import load_dotenv
 from flask_cors import CORS
+from ner_utils import categorize_entities
+from urllib3.util.retry import Retry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,7 +35,108 @@ SARVAM_MODEL = os.getenv('SARVAM_MODEL', 'saaras:v2.5')
 HF_API_TOKEN = os.getenv('HF_API_TOKEN')
 HF_API_URL = os.getenv('HF_API_URL', 'https://router.huggingface.co/hf-inference/models/d4data/biomedical-ner-all')
 
+# Upload parsing configuration
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_SPOOL_SIZE = 500 * 1024
+
+# NER batching configuration
+NER_BATCH_SIZE = int(os.getenv('NER_BATCH_SIZE', 8))
+NER_BATCH_WAIT = float(os.getenv('NER_BATCH_WAIT_MS', 20)) / 1000
+NER_TIMEOUT = float(os.getenv('NER_TIMEOUT', 60))
+NER_MAX_IN_FLIGHT = int(os.getenv('NER_MAX_IN_FLIGHT', 8))
+# Per HF call; kept well under NER_TIMEOUT so retries and per-input fallback still fit
+HF_REQUEST_TIMEOUT = float(os.getenv('HF_REQUEST_TIMEOUT', 10))
+
+# NER result caching, keyed by a hash of the transcript
+NER_CACHE_SIZE = int(os.getenv('NER_CACHE_SIZE', 2048))
+NER_CACHE_TTL = int(os.getenv('NER_CACHE_TTL', 3600))
+
+def create_session(retries: Retry) -> requests.Session:
+    """Create a pooled HTTP session that keeps connections alive between requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=retries
+    )
+    session.mount('https://', adapter)
+    return session
+
+# Shared sessions, kept open for the lifetime of the app.
+# Sarvam uploads are a one-shot streamed body, so only connection failures are retried.
+SARVAM_SESSION = create_session(Retry(total=3, backoff_factor=0.2))
+if SARVAM_API_KEY:
+    SARVAM_SESSION.headers['api-subscription-key'] = SARVAM_API_KEY
+
+# HF takes a JSON body that can be replayed, so POSTs are also retried on gateway errors
+HF_SESSION = create_session(Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=frozenset({'HEAD', 'POST'})
+))
+HF_SESSION.headers['Authorization'] = f"Bearer {HF_API_TOKEN}"
+
+def _warm_connections() -> None:
+    """Open a pooled connection to each API host so the first upload skips DNS and TLS setup"""
+    for session, url in ((SARVAM_SESSION, SARVAM_API_URL), (HF_SESSION, HF_API_URL)):
+        try:
+            session.head(url, timeout=10)
+        except requests.RequestException:
+            # Warmup is best effort; the real request will connect on its own
+            pass
+
+threading.Thread(target=_warm_connections, name="connection-warmup", daemon=True).start()
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any):
+        # Hand orjson's bytes to the response directly instead of decoding to str first
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+class SpooledFileTarget(BaseTarget):
+    """streaming-form-data target that buffers an uploaded file in memory, spilling to disk when large"""
+    
+    def __init__(self):
+        super().__init__()
+        self.received = False
+        self.finished = False
+        self.stream: BinaryIO = io.BytesIO()
+        self.rolled = False
+    
+    def on_start(self):
+        self.received = True
+    
+    def on_finish(self):
+        # Only called once the part's closing delimiter has been parsed
+        self.finished = True
+    
+    def on_data_received(self, chunk: bytes):
+        self.stream.write(chunk)
+        if not self.rolled and self.stream.tell() > UPLOAD_SPOOL_SIZE:
+            self._rollover()
+    
+    def _rollover(self):
+        # Managed here rather than with SpooledTemporaryFile, whose fileno() (called by
+        # MultipartEncoder to size the part) would force even small uploads onto disk
+        spilled = tempfile.TemporaryFile()
+        spilled.write(self.stream.getbuffer())
+        self.stream = spilled
+        self.rolled = True
+    
+    def close(self):
+        self.stream.close()
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 # Enable CORS for specific origins including localhost for development
 CORS(app, origins=[
     "https://airo-backend.onrender.com", 
@@ -41,37 +158,35 @@ def home():
         "description": "Send POST requests with audio files to /process_audio to get transcriptions and medical entity extraction"
     })
 
-def transcribe_audio_with_sarvam(audio_file_path: str) -> Dict[str, Any]:
+def transcribe_audio_with_sarvam(audio_file: BinaryIO, filename: str) -> Dict[str, Any]:
     """Transcribe audio using Sarvam AI"""
     try:
-        with open(audio_file_path, 'rb') as audio_file:
-            files = {
-                'file': (os.path.basename(audio_file_path), audio_file, 'audio/wav')
-            }
-            data = {
-                'model': SARVAM_MODEL
+        # Stream the multipart body from the upload instead of building it in memory
+        encoder = MultipartEncoder(fields={
+            'file': (filename, audio_file, 'audio/wav'),
+            'model': SARVAM_MODEL
+        })
+        headers = {
+            'Content-Type': encoder.content_type
+        }
+        
+        response = SARVAM_SESSION.post(SARVAM_API_URL, data=encoder, headers=headers)
+        
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            return {
+                "success": True,
+                "data": {
+                    "text": result.get('transcript', ''),
+                    "language_code": result.get('language_code', 'unknown')
+                }
             }
-            headers = {
-                'api-subscription-key': SARVAM_API_KEY
+        else:
+            return {
+                "success": False,
+                "error": f"Sarvam API error: {response.status_code}",
+                "details": response.text
             }
-            
-            response = requests.post(SARVAM_API_URL, files=files, data=data, headers=headers)
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "success": True,
-                    "data": {
-                        "text": result.get('transcript', ''),
-                        "language_code": result.get('language_code', 'unknown')
-                    }
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Sarvam API error: {response.status_code}",
-                    "details": response.text
-                }
     except Exception as e:
         return {
             "success": False,
@@ -79,84 +194,138 @@ def transcribe_audio_with_sarvam(audio_file_path: str) -> Dict[str, Any]:
             "details": str(e)
         }
 
-def extract_medical_entities(text: str) -> Dict[str, Any]:
-    """Extract medical entities using Hugging Face API"""
+# Pending (text, Future) pairs waiting to be sent to Hugging Face
+NER_QUEUE = queue.Queue()
+# Statuses that can be caused by a single input; anything else (auth, rate limit, outage) fails the batch
+NER_INPUT_ERROR_STATUSES = frozenset({400, 413, 422})
+NER_EXECUTOR = ThreadPoolExecutor(max_workers=NER_MAX_IN_FLIGHT, thread_name_prefix="ner-batch")
+
+def _fail_ner_batch(batch: list, error: Dict[str, Any]) -> None:
+    """Resolve every still-pending future in the batch with the same error result"""
+    for _, future in batch:
+        if not future.done():
+            future.set_result(error)
+
+def _send_ner_batch(batch: list) -> None:
+    """Send a batch of texts to Hugging Face in one call and resolve each caller's future"""
     try:
-        headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
+        # A lone text is sent as a plain string, which HF answers with a flat entity list
+        single = len(batch) == 1
         payload = {
-            "inputs": text
+            "inputs": batch[0][0] if single else [text for text, _ in batch]
         }
         
-        response = requests.post(HF_API_URL, headers=headers, json=payload)
+        # Read the body straight off the socket rather than through requests' chunked content buffer
+        with HF_SESSION.post(HF_API_URL, json=payload, stream=True, timeout=HF_REQUEST_TIMEOUT) as response:
+            status_code = response.status_code
+            body = response.raw.read(decode_content=True)
         
-        if response.status_code == 200:
-            raw_entities = response.json()
-            
-            # Process and categorize entities
-            medical_entities = {
-                "diseases": [],
-                "medications": [],
-                "symptoms": [],
-                "procedures": [],
-                "other": []
-            }
-            
-            # Entity mapping
-            entity_category_map = {
-                "DISEASE": "diseases",
-                "DRUG": "medications",
-                "SYMPTOM": "symptoms",
-                "PROCEDURE": "procedures",
-                "Diagnostic_procedure": "procedures",
-                "Medication": "medications",
-                "Sign_symptom": "symptoms"
-            }
-            
-            # Process entities
-            for entity in raw_entities:
-                entity_word = entity.get('word', '')
-                entity_group = entity.get('entity', '') or entity.get('entity_group', '')
-                
-                # Skip if word or group is empty
-                if not entity_word or not entity_group:
-                    continue
-                    
-                # Clean up the word
-                clean_word = entity_word.strip().rstrip('.,;:!?')
-                
-                # Skip if word is too short
-                if len(clean_word) < 2:
-                    continue
-                    
-                # Map to categories
-                category = None
-                for key, value in entity_category_map.items():
-                    if key in entity_group:
-                        category = value
-                        break
-                
-                if category:
-                    # Avoid duplicates
-                    if clean_word not in medical_entities[category]:
-                        medical_entities[category].append(clean_word)
+        results = orjson.loads(body) if status_code == 200 else None
+        if single and isinstance(results, list):
+            results = [results]
+        
+        # Expect one entity list per input, in the same order
+        if isinstance(results, list) and len(results) == len(batch):
+            for (_, future), raw_entities in zip(batch, results):
+                future.set_result({
+                    "success": True,
+                    "data": raw_entities
+                })
+        elif len(batch) > 1 and (status_code == 200 or status_code in NER_INPUT_ERROR_STATUSES):
+            # One bad input can reject or misshape the whole batch, so retry each input on its own
+            for item in batch:
+                NER_EXECUTOR.submit(_send_ner_batch, [item])
+        elif status_code != 200:
+            _fail_ner_batch(batch, {
+                "success": False,
+                "error": f"Hugging Face API error: {status_code}",
+                "details": body.decode('utf-8', errors='replace')
+            })
+        else:
+            raise ValueError("Unexpected Hugging Face response format")
+    except Exception as e:
+        _fail_ner_batch(batch, {
+            "success": False,
+            "error": "Failed to extract medical entities",
+            "details": str(e)
+        })
+
+def _run_ner_batcher() -> None:
+    """Collect up to NER_BATCH_SIZE texts, or whatever arrives within NER_BATCH_WAIT, per HF call"""
+    while True:
+        batch = []
+        deadline = None
+        
+        while len(batch) < NER_BATCH_SIZE:
+            try:
+                if deadline is None:
+                    item = NER_QUEUE.get()
+                    deadline = time.monotonic() + NER_BATCH_WAIT
                 else:
-                    # Add to other
-                    medical_entities["other"].append({
-                        "word": clean_word,
-                        "type": entity_group,
-                        "confidence": entity.get('score', 0)
-                    })
+                    item = NER_QUEUE.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
             
+            # Skip callers that already gave up waiting
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+        
+        if batch:
+            # Send on the executor so several batches can be in flight at once
+            NER_EXECUTOR.submit(_send_ner_batch, batch)
+
+threading.Thread(target=_run_ner_batcher, name="ner-batcher", daemon=True).start()
+
+# Worker pool for entity post-processing
+POST_POOL = ThreadPoolExecutor(max_workers=int(os.getenv('POST_POOL_WORKERS', 4)))
+
+# Raw HF entity lists and their categorized form, cached separately
+RAW_ENTITY_CACHE = TTLCache(maxsize=NER_CACHE_SIZE, ttl=NER_CACHE_TTL)
+CATEGORIZED_ENTITY_CACHE = TTLCache(maxsize=NER_CACHE_SIZE, ttl=NER_CACHE_TTL)
+NER_CACHE_LOCK = threading.Lock()
+
+def extract_medical_entities(text: str) -> Dict[str, Any]:
+    """Extract medical entities using Hugging Face API"""
+    try:
+        cache_key = blake2b(text.encode(), digest_size=16).digest()
+        
+        with NER_CACHE_LOCK:
+            medical_entities = CATEGORIZED_ENTITY_CACHE.get(cache_key)
+            raw_entities = RAW_ENTITY_CACHE.get(cache_key)
+        
+        if medical_entities is not None:
             return {
                 "success": True,
                 "data": medical_entities
             }
-        else:
-            return {
-                "success": False,
-                "error": f"Hugging Face API error: {response.status_code}",
-                "details": response.text
-            }
+        
+        if raw_entities is None:
+            future: Future = Future()
+            NER_QUEUE.put((text, future))
+            try:
+                ner_result = future.result(timeout=NER_TIMEOUT)
+            except FutureTimeoutError:
+                # Drop the text from the queue if it has not been sent yet
+                future.cancel()
+                raise
+            
+            if not ner_result["success"]:
+                return ner_result
+            
+            raw_entities = ner_result["data"]
+            with NER_CACHE_LOCK:
+                RAW_ENTITY_CACHE[cache_key] = raw_entities
+        
+        # Categorize on the worker pool rather than the request thread
+        medical_entities = POST_POOL.submit(categorize_entities, raw_entities).result(timeout=NER_TIMEOUT)
+        
+        with NER_CACHE_LOCK:
+            CATEGORIZED_ENTITY_CACHE[cache_key] = medical_entities
+        
+        return {
+            "success": True,
+            "data": medical_entities
+        }
     except Exception as e:
         return {
             "success": False,
@@ -167,67 +336,72 @@ def extract_medical_entities(text: str) -> Dict[str, Any]:
 @app.route('/process_audio', methods=['POST'])
 def process_audio():
     """Process uploaded audio file and return transcription + medical entities"""
+    file = SpooledFileTarget()
+    
     try:
-        # Check if file is provided
-        if 'file' not in request.files:
+        # Parse the upload with the compiled multipart parser instead of Werkzeug's
+        try:
+            parser = StreamingFormDataParser(headers=request.headers)
+            parser.register('file', file)
+            
+            while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+                parser.data_received(chunk)
+        except ParseFailedException:
+            # Not multipart, or a malformed body
             return jsonify({
                 "status": "error",
                 "message": "No audio file provided"
             }), 400
         
-        file = request.files['file']
+        # Check if file is provided, and was not cut off before its closing boundary
+        if not file.received or not file.finished:
+            return jsonify({
+                "status": "error",
+                "message": "No audio file provided"
+            }), 400
         
         # Check if file is selected
-        if file.filename == '':
+        if not file.multipart_filename:
             return jsonify({
                 "status": "error",
                 "message": "No audio file selected"
             }), 400
         
-        # Create temporary file to save the uploaded audio
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            file.save(tmp_file.name)
-            temp_filename = tmp_file.name
+        file.stream.seek(0)
         
-        try:
-            # Step 1: Transcribe audio with Sarvam
-            transcription_result = transcribe_audio_with_sarvam(temp_filename)
-            
-            if not transcription_result["success"]:
-                return jsonify({
-                    "status": "error",
-                    "message": "Failed to transcribe audio",
-                    "error_details": transcription_result["error"],
-                    "technical_details": transcription_result.get("details", "")
-                }), 500
-            
-            transcription_data = transcription_result["data"]
-            
-            # Step 2: Extract medical entities
-            entities_result = extract_medical_entities(transcription_data["text"])
-            
-            if not entities_result["success"]:
-                return jsonify({
-                    "status": "error",
-                    "message": "Failed to extract medical entities",
-                    "error_details": entities_result["error"],
-                    "technical_details": entities_result.get("details", "")
-                }), 500
-            
-            entities_data = entities_result["data"]
-            
-            # Return successful response
+        # Step 1: Transcribe audio with Sarvam
+        transcription_result = transcribe_audio_with_sarvam(file.stream, file.multipart_filename)
+        
+        if not transcription_result["success"]:
             return jsonify({
-                "status": "success",
-                "transcription": transcription_data,
-                "medical_entities": entities_data,
-                "audio_file": os.path.basename(temp_filename)
-            })
+                "status": "error",
+                "message": "Failed to transcribe audio",
+                "error_details": transcription_result["error"],
+                "technical_details": transcription_result.get("details", "")
+            }), 500
+        
+        transcription_data = transcription_result["data"]
+        
+        # Step 2: Extract medical entities
+        entities_result = extract_medical_entities(transcription_data["text"])
         
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_filename):
-                os.unlink(temp_filename)
+        if not entities_result["success"]:
+            return jsonify({
+                "status": "error",
+                "message": "Failed to extract medical entities",
+                "error_details": entities_result["error"],
+                "technical_details": entities_result.get("details", "")
+            }), 500
+        
+        entities_data = entities_result["data"]
+        
+        # Return successful response
+        return jsonify({
+            "status": "success",
+            "transcription": transcription_data,
+            "medical_entities": entities_data,
+            "audio_file": file.multipart_filename
+        })
     
     except Exception as e:
         return jsonify({
@@ -235,6 +409,9 @@ def process_audio():
             "message": "Internal server error",
             "error_details": str(e)
         }), 500
+    
+    finally:
+        file.close()
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -0,0 +1,25 @@
+import os
+
+# Gunicorn configuration for the Medical AI Copilot API
+# Start with: gunicorn app:app
+
+# Bind to the port provided by the platform (Render sets PORT)
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Requests spend most of their time waiting on Sarvam and Hugging Face,
+# so use threaded workers rather than one process per request.
+# WEB_CONCURRENCY sets the number of worker processes, GUNICORN_THREADS the number
+# of threads per worker. Each worker also runs its own NER and post-processing pools,
+# so the default is one worker per CPU this process may run on (like nproc), not
+# the host's total CPU count.
+if hasattr(os, 'sched_getaffinity'):
+    available_cpus = len(os.sched_getaffinity(0))
+else:
+    available_cpus = os.cpu_count() or 1
+
+worker_class = "gthread"
+workers = int(os.environ.get('WEB_CONCURRENCY', available_cpus))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Transcription of long recordings can take a while
+timeout = 120
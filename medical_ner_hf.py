@@ -1,8 +1,12 @@
+import numpy as np
+import orjson
 import requests
 import json
 import os
 from typing import Dict, List, Optional, Any
 
+from ner_utils import TRAILING_CHARS, categorize_entities
+
 class MedicalNERHF:
     def __init__(self, hf_api_token: str):
         """
@@ -12,6 +16,9 @@ class MedicalNERHF:
         # Updated endpoint as per the error message
         self.hf_api_url = "https://router.huggingface.co/hf-inference/models/d4data/biomedical-ner-all"
         self.headers = {"Authorization": f"Bearer {hf_api_token}"}
+        # Reuse one connection across calls instead of a new TLS handshake each time
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
     
     def extract_entities(self, text: str) -> Optional[List[Dict]]:
         """
@@ -24,14 +31,13 @@ class MedicalNERHF:
             }
             
             print("Sending text to Hugging Face Medical NER API...")
-            response = requests.post(
+            response = self.session.post(
                 self.hf_api_url,
-                headers=self.headers,
                 json=payload
             )
             
             if response.status_code == 200:
-                entities = response.json()
+                entities = orjson.loads(response.content)
                 print("Medical entities extracted successfully!")
                 return entities
             else:
@@ -48,41 +54,29 @@ class MedicalNERHF:
         """
         if not entities:
             return entities
-            
+        
+        starts = np.array([entity.get('start', 0) for entity in entities])
+        ends = np.array([entity.get('end', entity.get('start', 0)) for entity in entities])
+        
+        # A new group begins wherever an entity starts more than 2 characters
+        # (space or punctuation) past the furthest end seen so far
+        running_ends = np.maximum.accumulate(ends)
+        group_starts = np.concatenate(([0], np.flatnonzero(starts[1:] > running_ends[:-1] + 2) + 1))
+        group_ends = np.maximum.reduceat(ends, group_starts)
+        
         reconstructed = []
-        i = 0
         
-        while i < len(entities):
-            current = entities[i].copy()
-            
-            # Get the start and end positions
-            start_pos = current.get('start', 0)
-            end_pos = current.get('end', start_pos)
-            
-            # Look for consecutive entities that might be part of the same word
-            j = i + 1
-            while j < len(entities):
-                next_entity = entities[j]
-                next_start = next_entity.get('start', 0)
-                
-                # If the next entity starts right after the current one ends, 
-                # and they're likely part of the same word
-                if next_start <= end_pos + 2:  # Allow for space or punctuation
-                    # Extend the end position
-                    end_pos = max(end_pos, next_entity.get('end', next_start))
-                    j += 1
-                else:
-                    break
+        for index, end_pos in zip(group_starts.tolist(), group_ends.tolist()):
+            current = entities[index].copy()
+            start_pos = int(starts[index])
             
             # Extract the actual text from the original text
             if start_pos < len(original_text) and end_pos <= len(original_text):
-                actual_text = original_text[start_pos:end_pos].strip()
-                # Remove any trailing punctuation that might have been included
-                actual_text = actual_text.rstrip('.,;:!?')
+                # Remove surrounding whitespace and any trailing punctuation that might have been included
+                actual_text = original_text[start_pos:end_pos].lstrip().rstrip(TRAILING_CHARS)
                 current['word'] = actual_text
             
             reconstructed.append(current)
-            i = j  # Skip the entities we've processed
             
         return reconstructed
     
@@ -109,60 +103,7 @@ class MedicalNERHF:
         processed_entities = self._reconstruct_entities(raw_entities, transcription)
         
         # Categorize entities
-        medical_entities: Dict[str, Any] = {
-            "diseases": [],
-            "medications": [],
-            "symptoms": [],
-            "procedures": [],
-            "other": []
-        }
-        
-        # Common medical entity mappings
-        entity_category_map = {
-            "DISEASE": "diseases",
-            "DRUG": "medications",
-            "SYMPTOM": "symptoms",
-            "PROCEDURE": "procedures",
-            "Diagnostic_procedure": "procedures",
-            "Medication": "medications",
-            "Sign_symptom": "symptoms"
-        }
-        
-        for entity in processed_entities:
-            entity_word = entity.get('word', '')
-            entity_group = entity.get('entity', '') or entity.get('entity_group', '')
-            
-            # Skip if word or group is empty
-            if not entity_word or not entity_group:
-                continue
-                
-            # Clean up the word
-            clean_word = entity_word.strip().rstrip('.,;:!?')
-            
-            # Skip if word is too short or just punctuation
-            if len(clean_word) < 2:
-                continue
-                
-            # Map to our categories
-            category = None
-            for key, value in entity_category_map.items():
-                if key in entity_group:
-                    category = value
-                    break
-            
-            if category:
-                # Avoid duplicates
-                if clean_word not in medical_entities[category]:
-                    medical_entities[category].append(clean_word)
-            else:
-                # Add to other with entity type info
-                medical_entities["other"].append({
-                    "word": clean_word,
-                    "type": entity_group,
-                    "confidence": entity.get('score', 0)
-                })
-        
-        return medical_entities
+        return categorize_entities(processed_entities)
 
 def main():
     # Get Hugging Face API token from environment variables
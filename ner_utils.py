@@ -0,0 +1,64 @@
+import re
+import string
+from typing import Dict, List, Any
+
+# Common medical entity mappings, matched with a single regex scan per entity
+CATEGORY_RE = re.compile(r'(DISEASE|DRUG|SYMPTOM|PROCEDURE|Diagnostic_procedure|Medication|Sign_symptom)')
+CATEGORY_LOOKUP = {
+    "DISEASE": "diseases",
+    "DRUG": "medications",
+    "SYMPTOM": "symptoms",
+    "PROCEDURE": "procedures",
+    "Diagnostic_procedure": "procedures",
+    "Medication": "medications",
+    "Sign_symptom": "symptoms"
+}
+
+# Trailing whitespace and punctuation, stripped together in a single rstrip
+TRAILING_CHARS = string.whitespace + '.,;:!?'
+
+def categorize_entities(raw_entities: List[Dict]) -> Dict[str, Any]:
+    """
+    Categorize Hugging Face NER entities into diseases, medications, symptoms, procedures and other
+    """
+    medical_entities: Dict[str, Any] = {
+        "diseases": {},
+        "medications": {},
+        "symptoms": {},
+        "procedures": {},
+        "other": []
+    }
+    
+    for entity in raw_entities:
+        entity_word = entity.get('word', '')
+        entity_group = entity.get('entity', '') or entity.get('entity_group', '')
+        
+        # Skip if word or group is empty
+        if not entity_word or not entity_group:
+            continue
+            
+        # Clean up the word
+        clean_word = entity_word.lstrip().rstrip(TRAILING_CHARS)
+        
+        # Skip if word is too short or just punctuation
+        if len(clean_word) < 2:
+            continue
+            
+        # Map to our categories
+        match = CATEGORY_RE.search(entity_group)
+        category = CATEGORY_LOOKUP[match.group(1)] if match else None
+        
+        if category:
+            # Dict keys act as an insertion-ordered set, so duplicates are skipped in O(1)
+            medical_entities[category].setdefault(clean_word, None)
+        else:
+            # Add to other with entity type info
+            medical_entities["other"].append({
+                "word": clean_word,
+                "type": entity_group,
+                "confidence": entity.get('score', 0)
+            })
+    
+    return {
+        category: list(words) for category, words in medical_entities.items()
+    }
@@ -1,9 +1,10 @@
-import pyaudio
-import wave
+import orjson
 import requests
+from requests_toolbelt import MultipartEncoder
 import time
 import threading
 import os
+from functools import cached_property
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -14,26 +15,42 @@ API_KEY = os.getenv('SARVAM_API_KEY')
 API_URL = os.getenv('SARVAM_API_URL', 'https://api.sarvam.ai/speech-to-text-translate')
 MODEL = os.getenv('SARVAM_MODEL', 'saaras:v2.5')
 
+# Shared session so repeated uploads reuse the same connection
+SESSION = requests.Session()
+
 # Audio recording configuration
 CHUNK = 1024
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 44100
 RECORD_SECONDS = 5
+SAMPLE_WIDTH = 2  # bytes per sample for paInt16
 WAVE_OUTPUT_FILENAME = "recording.wav"
 
 class AudioRecorder:
     def __init__(self):
         self.recording = False
-        self.audio = pyaudio.PyAudio()
         self.stream = None
-        self.frames = []
+        self.wave_file = None
+
+    @cached_property
+    def audio(self):
+        """PortAudio handle, created on first use so importing this module stays cheap"""
+        import pyaudio
+        return pyaudio.PyAudio()
 
     def start_recording(self):
         """Start recording audio"""
-        self.frames = []
+        import pyaudio
+        import wave
+        
+        # Write frames to disk as they arrive; the header is patched with the real length on close
+        self.wave_file = wave.open(WAVE_OUTPUT_FILENAME, 'wb')
+        self.wave_file.setnchannels(CHANNELS)
+        self.wave_file.setsampwidth(SAMPLE_WIDTH)
+        self.wave_file.setframerate(RATE)
+        
         self.stream = self.audio.open(
-            format=FORMAT,
+            format=pyaudio.paInt16,
             channels=CHANNELS,
             rate=RATE,
             input=True,
@@ -46,7 +63,7 @@ class AudioRecorder:
         while self.recording:
             try:
                 data = self.stream.read(CHUNK)
-                self.frames.append(data)
+                self.wave_file.writeframesraw(data)
             except Exception as e:
                 print(f"Error recording: {e}")
                 break
@@ -61,34 +78,31 @@ class AudioRecorder:
         print("Recording stopped")
 
     def save_recording(self):
-        """Save the recorded audio to a WAV file"""
-        wf = wave.open(WAVE_OUTPUT_FILENAME, 'wb')
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(self.audio.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(self.frames))
-        wf.close()
+        """Finish the WAV file written during recording"""
+        if self.wave_file:
+            self.wave_file.close()
+            self.wave_file = None
         print(f"Audio saved as {WAVE_OUTPUT_FILENAME}")
 
 def send_to_sarvam():
     """Send recorded audio to Sarvam AI for translation"""
     try:
         with open(WAVE_OUTPUT_FILENAME, 'rb') as audio_file:
-            files = {
-                'file': (WAVE_OUTPUT_FILENAME, audio_file, 'audio/wav')
-            }
-            data = {
+            # Stream the multipart body from disk instead of building it in memory
+            encoder = MultipartEncoder(fields={
+                'file': (WAVE_OUTPUT_FILENAME, audio_file, 'audio/wav'),
                 'model': MODEL
-            }
+            })
             headers = {
-                'api-subscription-key': API_KEY
+                'api-subscription-key': API_KEY,
+                'Content-Type': encoder.content_type
             }
             
             print("Sending audio to Sarvam AI for translation...")
-            response = requests.post(API_URL, files=files, data=data, headers=headers)
+            response = SESSION.post(API_URL, data=encoder, headers=headers)
             
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 print("Translation result:")
                 # Extract the transcript from the response
                 transcript = result.get('transcript', 'No transcript found')